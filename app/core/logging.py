@@ -3,9 +3,11 @@ Logging Configuration
 日志配置模块 - 使用 FastAPI/Uvicorn 标准日志 + 日志轮转
 """
 import logging
+import queue
 import sys
+import time
 from pathlib import Path
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler, WatchedFileHandler
 
 from config import settings
 
@@ -13,13 +15,94 @@ from config import settings
 # 标记是否已初始化，防止重复配置
 _logging_configured = False
 
+# 后台日志线程（真正执行控制台/文件写入），关闭时由 lifespan 调用 shutdown_logging()
+_listener: QueueListener = None
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    有界队列日志处理器
+    队列已满（后台线程写不过来）时直接丢弃日志并计数，不阻塞请求处理
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        不在调用方线程格式化日志
+        默认实现会先格式化消息并复制 LogRecord（为了跨进程传递），
+        这里队列和后台线程在同一进程内，直接传递原始记录，格式化交给后台线程
+        """
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _DrainingQueueListener(QueueListener):
+    """
+    后台日志线程
+    - 发现有日志被丢弃时输出告警（限频，避免告警本身刷屏）
+    - 停止时阻塞等待队列腾出空间再放入结束标记（有界队列已满时 put_nowait 会失败）
+    """
+    
+    # 两次丢弃告警之间的最小间隔（秒）
+    drop_warning_interval = 60.0
+    
+    def __init__(self, queue_handler: BoundedQueueHandler, *handlers, respect_handler_level=False):
+        super().__init__(queue_handler.queue, *handlers, respect_handler_level=respect_handler_level)
+        self.queue_handler = queue_handler
+        self._reported_dropped = 0
+        self._last_drop_warning = None
+    
+    def handle(self, record: logging.LogRecord):
+        super().handle(record)
+        self.report_dropped()
+    
+    def report_dropped(self, force: bool = False):
+        """
+        有新的日志被丢弃时，直接交给控制台/文件处理器输出告警（不经过已满的队列）
+        
+        Args:
+            force: 忽略限频（停止时输出剩余的丢弃统计）
+        """
+        dropped = self.queue_handler.dropped
+        if dropped == self._reported_dropped:
+            return
+        
+        now = time.monotonic()
+        if (not force and self._last_drop_warning is not None
+                and now - self._last_drop_warning < self.drop_warning_interval):
+            return
+        
+        logger = logging.getLogger(__name__)
+        record = logger.makeRecord(
+            logger.name, logging.WARNING, __file__, 0,
+            "日志队列已满，丢弃了 %d 条日志（累计 %d 条）",
+            (dropped - self._reported_dropped, dropped), None, func="report_dropped"
+        )
+        self._reported_dropped = dropped
+        self._last_drop_warning = now
+        super().handle(record)
+    
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
 
 def setup_logging():
     """
     配置应用日志
     使用 Python 标准 logging + Uvicorn 集成 + 按日期轮转
+    
+    根日志器只挂 QueueHandler，日志记录入队后立即返回；
+    控制台和文件写入由 QueueListener 后台线程完成，不阻塞事件循环
     """
-    global _logging_configured
+    global _logging_configured, _listener
     
     # 如果已经配置过，直接返回（防止重复添加 handler）
     if _logging_configured:
@@ -28,6 +111,13 @@ def setup_logging():
     # 确保日志目录存在
     settings.logs_dir.mkdir(parents=True, exist_ok=True)
     
+    # 解析日志级别（只解析一次；大小写不敏感，无法识别时回退到 INFO）
+    level_name = settings.log_level.upper()
+    level = logging.getLevelNamesMapping().get(level_name)
+    level_recognized = level is not None
+    if not level_recognized:
+        level = logging.INFO
+    
     # 日志格式
     log_format = "%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d - %(message)s"
     date_format = "%Y-%m-%d %H:%M:%S"
@@ -41,31 +131,53 @@ def setup_logging():
     
     # 控制台处理器
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(getattr(logging, settings.log_level))
+    console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
     
-    # 文件处理器（按日期轮转）
-    # when='midnight': 每天午夜轮转
-    # interval=1: 每1天
-    # backupCount: 保留多少天的日志（从配置读取）
-    file_handler = TimedRotatingFileHandler(
-        filename=settings.log_file_path,
-        when='midnight',
-        interval=1,
-        backupCount=settings.log_backup_count,
-        encoding='utf-8',
-        delay=False,
-        utc=False
-    )
-    file_handler.setLevel(getattr(logging, settings.log_level))
+    # 多个 worker 进程各自持有 TimedRotatingFileHandler 时，午夜会重复轮转、互相删除刚轮转出的文件，
+    # 因此多进程时不在进程内轮转，改为由外部工具轮转
+    multi_worker_rotation = settings.worker_count > 1 and not settings.log_rotate_externally
+    
+    if settings.log_rotate_externally or multi_worker_rotation:
+        # 文件处理器（由 logrotate 等外部工具轮转）
+        # 文件被移走后会自动重新打开，不需要 copytruncate
+        file_handler = WatchedFileHandler(
+            filename=settings.log_file_path,
+            encoding='utf-8'
+        )
+    else:
+        # 文件处理器（按日期轮转）
+        # when='midnight': 每天午夜轮转
+        # interval=1: 每1天
+        # backupCount: 保留多少天的日志（从配置读取）
+        # 轮转检查运行在 QueueListener 后台线程中，不占用事件循环
+        file_handler = TimedRotatingFileHandler(
+            filename=settings.log_file_path,
+            when='midnight',
+            interval=1,
+            backupCount=settings.log_backup_count,
+            encoding='utf-8',
+            delay=False,
+            utc=False
+        )
+        # 设置日志文件名后缀格式（YYYYMMDD）
+        file_handler.suffix = "%Y%m%d"
+    file_handler.setLevel(level)
     file_handler.setFormatter(formatter)
-    # 设置日志文件名后缀格式（YYYYMMDD）
-    file_handler.suffix = "%Y%m%d"
     
-    # 配置根日志器
-    root_logger.setLevel(getattr(logging, settings.log_level))
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
+    # 配置根日志器（只挂队列处理器，实际 I/O 交给后台线程）
+    # 队列有上限，日志量超过写入能力时丢弃而不是无限占用内存
+    queue_handler = BoundedQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    root_logger.setLevel(level)
+    root_logger.addHandler(queue_handler)
+    
+    _listener = _DrainingQueueListener(
+        queue_handler,
+        console_handler,
+        file_handler,
+        respect_handler_level=True
+    )
+    _listener.start()
     
     # 标记已初始化
     _logging_configured = True
@@ -75,7 +187,39 @@ def setup_logging():
     logging.getLogger("httpcore").setLevel(logging.WARNING)
     logging.getLogger("anthropic").setLevel(logging.INFO)
     
-    return logging.getLogger(__name__)
+    logger = logging.getLogger(__name__)
+    if not level_recognized:
+        logger.warning("无法识别的日志级别 %r，已回退到 INFO", settings.log_level)
+    if multi_worker_rotation:
+        logger.warning(
+            "运行 %d 个 worker 进程，日志文件不会自动按日期轮转，请使用 logrotate 等外部工具"
+            "（并设置 log_rotate_externally=true）", settings.worker_count
+        )
+    
+    return logger
+
+
+def shutdown_logging():
+    """
+    停止后台日志线程
+    会先写完队列中剩余的日志，再关闭控制台/文件处理器
+    """
+    global _logging_configured, _listener
+    
+    if _listener is None:
+        return
+    
+    _listener.stop()
+    
+    # 队列已停止，尚未报告的丢弃统计直接交给控制台/文件处理器输出
+    _listener.report_dropped(force=True)
+    
+    for handler in _listener.handlers:
+        handler.close()
+    
+    logging.getLogger().handlers.clear()
+    _listener = None
+    _logging_configured = False
 
 
 def get_logger(name: str) -> logging.Logger:
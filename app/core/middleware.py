@@ -8,6 +8,9 @@ from typing import Callable
 
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import Receive, Scope, Send
+
+from config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +18,19 @@ logger = logging.getLogger(__name__)
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     """
     请求日志中间件
-    记录所有 API 请求的详细信息
+    记录所有 API 请求的详细信息（CORS 预检等 OPTIONS 请求除外）
     """
     
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """
+        OPTIONS 请求不记录日志，直接交给下游（由 CORSMiddleware 应答），
+        跳过 BaseHTTPMiddleware 为每个请求创建的任务和响应流
+        """
+        if scope["type"] == "http" and scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+    
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """
         处理请求
@@ -29,41 +42,38 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
         Returns:
             响应对象
         """
-        # 开始时间
-        start_time = time.time()
+        # 开始时间（单调时钟，不受系统时间调整影响）
+        start_time = time.perf_counter()
         
-        # 记录请求信息
-        logger.info(
-            f"Request: {request.method} {request.url.path} "
-            f"| Client: {request.client.host if request.client else 'Unknown'}"
-        )
+        # 只解析一次请求属性
+        method = request.method
+        path = request.url.path
+        client_host = request.client.host if request.client else 'Unknown'
         
         # 处理请求
         try:
             response = await call_next(request)
             
-            # 计算处理时间
-            process_time = time.time() - start_time
-            
-            # 记录响应信息
-            logger.info(
-                f"Response: {request.method} {request.url.path} "
-                f"| Status: {response.status_code} "
-                f"| Time: {process_time:.3f}s"
-            )
-            
-            # 添加处理时间到响应头
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            return response
-            
         except Exception as e:
             # 记录错误
-            process_time = time.time() - start_time
+            process_time = time.perf_counter() - start_time
             logger.error(
-                f"Error: {request.method} {request.url.path} "
-                f"| Exception: {type(e).__name__}: {str(e)} "
-                f"| Time: {process_time:.3f}s"
+                "Error: %s %s | Client: %s | Exception: %s: %s | Time: %.3fs",
+                method, path, client_host, type(e).__name__, e, process_time
             )
             raise
-
+        
+        # 计算处理时间
+        process_time = time.perf_counter() - start_time
+        
+        # 请求和响应合并为一条日志
+        logger.info(
+            "%s %s | Client: %s | Status: %d | Time: %.3fs",
+            method, path, client_host, response.status_code, process_time
+        )
+        
+        # 调试模式下添加处理时间到响应头
+        if settings.debug:
+            response.headers["X-Process-Time"] = f"{process_time:.6f}"
+        
+        return response
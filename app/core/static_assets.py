@@ -0,0 +1,282 @@
+"""
+Static Assets
+静态资源缓存 - 启动时读入内存并预压缩，请求时直接返回
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import zlib
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+from typing import Callable, Optional
+
+import brotli
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+
+logger = logging.getLogger(__name__)
+
+# 超过该大小的文件不读入内存，请求时用 FileResponse（sendfile）发送
+MAX_CACHED_SIZE = 1024 * 1024
+
+# 值得压缩的非 text/* 类型
+_COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+}
+
+# 预压缩临时文件名中源文件名之后的部分，如 "app.js.1234.tmp.br" 中的 ".1234.tmp"
+_TMP_NAME = re.compile(r"\.\d+\.tmp$")
+
+# 预压缩文件后缀及对应的压缩/解压方法（按优先级排序）
+_ENCODINGS: dict[str, tuple[str, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "br": (".br", lambda data: brotli.compress(data, quality=11), brotli.decompress),
+    "gzip": (".gz", lambda data: gzip.compress(data, 9), gzip.decompress),
+}
+
+
+@dataclass(frozen=True)
+class StaticAsset:
+    """静态资源（原始内容 + 预压缩内容 + 响应头所需信息）"""
+    path: Path
+    body: Optional[bytes]  # 大文件为 None，直接从磁盘发送
+    encoded_bodies: dict[str, bytes]  # {编码: 预压缩内容}，如 {"br": ..., "gzip": ...}
+    etag: str
+    media_type: str
+    last_modified: str
+    stat_key: tuple[int, int]  # (修改时间 ns, 文件大小)，用于判断文件是否变化
+
+
+def _guess_media_type(path: Path) -> str:
+    """根据文件名推断 Content-Type"""
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if media_type.startswith("text/"):
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+def _is_compressible(media_type: str) -> bool:
+    """是否为值得压缩的文本类内容"""
+    base_type = media_type.split(";", 1)[0]
+    return base_type.startswith("text/") or base_type in _COMPRESSIBLE_TYPES
+
+
+def _has_encoding_suffix(path: Path) -> bool:
+    """文件名是否以 .br / .gz 结尾（内容本身已压缩，不再二次压缩）"""
+    return any(path.name.endswith(suffix) for suffix, _, _ in _ENCODINGS.values())
+
+
+def _is_precompressed_file(path: Path) -> bool:
+    """
+    是否为预压缩生成的 .br / .gz 文件（或其写入中的临时文件）
+    只有同目录存在对应源文件时才算；单独发布的 .gz / .br 文件（如 data.json.gz）仍作为普通静态文件
+    """
+    for suffix, _, _ in _ENCODINGS.values():
+        if path.name.endswith(suffix):
+            source_name = _TMP_NAME.sub("", path.name[:-len(suffix)])
+            if path.with_name(source_name).is_file():
+                return True
+    return False
+
+
+def _read_precompressed(
+    target: Path, body: bytes, decompress: Callable[[bytes], bytes]
+) -> Optional[bytes]:
+    """
+    读取预压缩文件，并校验解压后与源文件内容一致
+    不能只看修改时间：部署时保留了旧时间戳（rsync -a、cp -p）的源文件可能对应过期的压缩文件
+    
+    Args:
+        target: 预压缩文件路径
+        body: 源文件内容
+        decompress: 解压方法
+    
+    Returns:
+        预压缩内容；文件不存在、不完整或内容不一致时返回 None
+    """
+    try:
+        encoded = target.read_bytes()
+        if decompress(encoded) == body:
+            return encoded
+    except (OSError, EOFError, zlib.error, brotli.error):
+        pass
+    return None
+
+
+def precompress_static(static_dir: Path):
+    """
+    为文本类静态文件在同目录生成 .br / .gz 预压缩文件（缺失或与源文件不一致时）
+    多个 worker 启动时直接读取压缩结果，不必各自重新压缩
+    
+    Args:
+        static_dir: 静态文件目录
+    """
+    for path in static_dir.rglob("*"):
+        if not path.is_file() or _has_encoding_suffix(path):
+            continue
+        if path.stat().st_size > MAX_CACHED_SIZE or not _is_compressible(_guess_media_type(path)):
+            continue
+        
+        data = path.read_bytes()
+        for suffix, compress, decompress in _ENCODINGS.values():
+            target = path.with_name(path.name + suffix)
+            if _read_precompressed(target, data, decompress) is not None:
+                continue
+            # 多个 worker 同时启动：先写临时文件再原子替换，其他 worker 不会读到写了一半的文件
+            # 临时文件同样以 .br / .gz 结尾，扫描目录时会被跳过
+            tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp{suffix}")
+            try:
+                tmp_file.write_bytes(compress(data))
+                os.replace(tmp_file, target)
+            except OSError as e:
+                # 静态目录只读时跳过，启动时会在内存中压缩
+                tmp_file.unlink(missing_ok=True)
+                logger.warning("无法写入预压缩文件 %s: %s", target, e)
+
+
+def load_asset(path: Path, compress: bool = True) -> Optional[StaticAsset]:
+    """
+    读取静态文件及其预压缩内容，并计算 ETag
+    
+    Args:
+        path: 文件路径
+        compress: 没有可用的预压缩文件时是否在内存中压缩（调试模式下关闭，避免反复执行高压缩级别）
+    
+    Returns:
+        静态资源；文件不存在时返回 None
+    """
+    if not path.is_file():
+        return None
+    
+    stat = path.stat()
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    media_type = _guess_media_type(path)
+    
+    if stat.st_size > MAX_CACHED_SIZE:
+        return StaticAsset(
+            path=path,
+            body=None,
+            encoded_bodies={},
+            etag='"%x-%x"' % (int(stat.st_mtime), stat.st_size),
+            media_type=media_type,
+            last_modified=formatdate(stat.st_mtime, usegmt=True),
+            stat_key=stat_key,
+        )
+    
+    body = path.read_bytes()
+    
+    # 优先读取同目录的预压缩文件，没有（或与源文件不一致）时在内存中压缩
+    encoded_bodies = {}
+    if _is_compressible(media_type) and not _has_encoding_suffix(path):
+        for encoding, (suffix, compress_func, decompress) in _ENCODINGS.items():
+            encoded = _read_precompressed(path.with_name(path.name + suffix), body, decompress)
+            if encoded is None:
+                if not compress:
+                    continue
+                encoded = compress_func(body)
+            # 压缩后没有变小的内容不保留
+            if len(encoded) < len(body):
+                encoded_bodies[encoding] = encoded
+    
+    return StaticAsset(
+        path=path,
+        body=body,
+        encoded_bodies=encoded_bodies,
+        etag='"%s"' % hashlib.blake2b(body, digest_size=8).hexdigest(),
+        media_type=media_type,
+        last_modified=formatdate(stat.st_mtime, usegmt=True),
+        stat_key=stat_key,
+    )
+
+
+def build_manifest(
+    static_dir: Path,
+    compress: bool = True,
+    previous: Optional[dict[str, StaticAsset]] = None,
+) -> dict[str, StaticAsset]:
+    """
+    扫描静态目录，生成 {相对路径: 静态资源} 清单
+    请求时只需查字典，不再访问文件系统
+    
+    Args:
+        static_dir: 静态文件目录
+        compress: 是否在内存中压缩缺少预压缩文件的资源
+        previous: 上一次的清单；文件修改时间和大小都没变时直接复用，只重新读取变化的文件
+    
+    Returns:
+        静态资源清单，键为 POSIX 风格的相对路径（如 "index.html"、"js/app.js"）
+    """
+    manifest = {}
+    for path in static_dir.rglob("*"):
+        if _is_precompressed_file(path) or not path.is_file():
+            continue
+        key = path.relative_to(static_dir).as_posix()
+        
+        old = previous.get(key) if previous else None
+        if old is not None:
+            stat = path.stat()
+            if old.stat_key == (stat.st_mtime_ns, stat.st_size):
+                manifest[key] = old
+                continue
+        
+        asset = load_asset(path, compress)
+        if asset is not None:
+            manifest[key] = asset
+    return manifest
+
+
+def _accepted_encodings(request: Request) -> set[str]:
+    """解析 Accept-Encoding，返回客户端接受的编码（忽略 q=0 的编码）"""
+    encodings = set()
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+def asset_response(request: Request, asset: StaticAsset, cache_control: str) -> Response:
+    """
+    根据请求头构造静态资源响应
+    - If-None-Match 命中时返回 304
+    - 按 br > gzip > 原始内容 的顺序选择客户端支持的编码
+    
+    Args:
+        request: 请求对象
+        asset: 静态资源
+        cache_control: Cache-Control 响应头
+    
+    Returns:
+        响应对象
+    """
+    headers = {
+        "ETag": asset.etag,
+        "Last-Modified": asset.last_modified,
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if asset.etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    
+    if asset.body is None:
+        return FileResponse(asset.path, media_type=asset.media_type, headers=headers)
+    
+    if asset.encoded_bodies:
+        accepted = _accepted_encodings(request)
+        for encoding, encoded in asset.encoded_bodies.items():
+            if encoding in accepted:
+                headers["Content-Encoding"] = encoding
+                return Response(content=encoded, media_type=asset.media_type, headers=headers)
+    
+    return Response(content=asset.body, media_type=asset.media_type, headers=headers)
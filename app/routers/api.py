@@ -3,10 +3,16 @@ API Routes
 API 路由定义
 """
 import asyncio
+import contextlib
 import logging
 from pathlib import Path
+from typing import AsyncIterator
 
-from fastapi import APIRouter, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.openapi.constants import REF_PREFIX
+from pydantic import BaseModel, ValidationError
 from fastapi.responses import StreamingResponse, HTMLResponse
 
 from app.models.schemas import ClassifyRequest, TranslateRequest, ClassificationResult
@@ -18,9 +24,148 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["api"])
 
+# 固定内容的 SSE 响应（预先拼好并编码，一次发送）
+_CLARIFY_SSE = (
+    "data: [输入信息不足]\n\n"
+    "data: \n\n"
+    "data: 为了更好地帮助您，请补充：\n\n"
+    "data: 1. 如果这是产品需求，请说明：想解决什么问题？预期目标？\n\n"
+    "data: 2. 如果这是技术方案，请说明：改动背景？解决什么问题？\n\n"
+    "data: [END]\n\n"
+).encode()
 
-@router.post("/classify", response_model=ClassificationResult)
-async def classify(request: ClassifyRequest) -> ClassificationResult:
+_SPLIT_SSE = (
+    "data: [检测到多个话题]\n\n"
+    "data: \n\n"
+    "data: 建议分别讨论以下话题：\n\n"
+    "data: 请选择其中一个话题重新输入。\n\n"
+    "data: [END]\n\n"
+).encode()
+
+# 流式响应的固定帧
+_SSE_CONNECTED = b": connected\n\n"
+_SSE_END = b"data: [END]\n\n"
+
+# 由 _json_body 解析的请求体模型（需要在 OpenAPI 文档中注册，见 main.py）
+REQUEST_BODY_MODELS = (ClassifyRequest, TranslateRequest)
+
+# 输入过短时的 400 响应体（预先序列化，格式与 HTTPException 一致）
+_SHORT_INPUT_BODY = orjson.dumps({"detail": "输入内容过短，至少需要5个字符"})
+
+# 上游 chunk 缓冲上限：客户端读得慢时，队列满后上游 LLM 流会被阻塞（背压）
+_STREAM_QUEUE_SIZE = 64
+
+# 每隔多少个 chunk 检查一次客户端是否已断开
+_DISCONNECT_CHECK_INTERVAL = 16
+
+# 上游流结束标记
+_STREAM_END = object()
+
+
+def _too_short(text: str, min_length: int = 5) -> bool:
+    """
+    判断输入是否过短（等价于 len(text.strip()) < min_length）
+    首尾不是空白字符时 strip 不会改变长度，直接比较长度，避免复制整段输入
+    
+    Args:
+        text: 用户输入
+        min_length: 最小长度
+        
+    Returns:
+        是否过短
+    """
+    if len(text) < min_length:
+        return True
+    if not text[0].isspace() and not text[-1].isspace():
+        return False
+    return len(text.strip()) < min_length
+
+
+def _is_json_content_type(content_type: str) -> bool:
+    """是否为 application/json 或 application/*+json"""
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type == "application/json" or (
+        media_type.startswith("application/") and media_type.endswith("+json")
+    )
+
+
+def _json_body(model: type[BaseModel]):
+    """
+    生成请求体解析依赖：直接用 model_validate_json 校验原始 bytes
+    JSON 解析和字段校验一次在 pydantic-core 中完成，不经过 json.loads 和 FastAPI 的通用校验流程
+    
+    只接受 JSON Content-Type（缺少 Content-Type 也拒绝，这一点比 FastAPI 默认行为严格）：
+    text/plain 或不带 Content-Type 的请求属于 CORS 简单请求，跨域页面无需预检即可发起，不能让它们触发 LLM 调用
+    
+    Args:
+        model: 请求体模型
+        
+    Returns:
+        FastAPI 依赖函数；校验失败时抛出 RequestValidationError（返回 422，格式与默认一致）
+    """
+    async def parse(request: Request):
+        body = await request.body()
+        if not _is_json_content_type(request.headers.get("content-type", "")):
+            raise RequestValidationError([{
+                "type": "content_type",
+                "loc": ("body",),
+                "msg": "Content-Type 必须为 application/json",
+                "input": None,
+            }], body=body)
+        try:
+            return model.model_validate_json(body)
+        except ValidationError as e:
+            errors = [{**err, "loc": ("body", *err["loc"])} for err in e.errors()]
+            raise RequestValidationError(errors, body=body)
+    return parse
+
+
+def _openapi_body(model: type[BaseModel]) -> dict:
+    """请求体改由依赖解析后，补充 OpenAPI 文档中的 requestBody 和 422 响应（与 FastAPI 自动生成的一致）"""
+    return {
+        "requestBody": {
+            "content": {"application/json": {"schema": {"$ref": REF_PREFIX + model.__name__}}},
+            "required": True,
+        },
+        "responses": {
+            "422": {
+                "description": "Validation Error",
+                "content": {"application/json": {"schema": {"$ref": REF_PREFIX + "HTTPValidationError"}}},
+            }
+        },
+    }
+
+
+def _short_input_response() -> Response:
+    """
+    构造输入过短的 400 响应
+    响应体已预先序列化；Response 对象每次新建，避免中间件修改响应头时影响其他请求
+    """
+    return Response(content=_SHORT_INPUT_BODY, status_code=400, media_type="application/json")
+
+
+async def _produce(stream: AsyncIterator[str], queue: asyncio.Queue):
+    """
+    把上游流的 chunk 放入有界队列
+    
+    队列满时 put 会阻塞，从而暂停读取上游；上游的异常也通过队列交给消费者处理
+    
+    Args:
+        stream: 上游文本流
+        queue: 有界队列
+    """
+    try:
+        async with contextlib.aclosing(stream):
+            async for chunk in stream:
+                await queue.put(chunk)
+    except Exception as e:
+        await queue.put(e)
+    else:
+        await queue.put(_STREAM_END)
+
+
+@router.post("/classify", response_model=ClassificationResult, openapi_extra=_openapi_body(ClassifyRequest))
+async def classify(request: ClassifyRequest = Depends(_json_body(ClassifyRequest))) -> ClassificationResult:
     """
     分类用户输入
     
@@ -30,40 +175,35 @@ async def classify(request: ClassifyRequest) -> ClassificationResult:
     Returns:
         JSON 格式的分类结果
     """
-    if not request.text or len(request.text.strip()) < 5:
-        raise HTTPException(
-            status_code=400,
-            detail="输入内容过短，至少需要5个字符"
-        )
+    if _too_short(request.text):
+        return _short_input_response()
     
     result = await classify_input(request.text)
     return result
 
 
-@router.post("/translate")
-async def translate(request: TranslateRequest):
+@router.post("/translate", openapi_extra=_openapi_body(TranslateRequest))
+async def translate(http_request: Request, request: TranslateRequest = Depends(_json_body(TranslateRequest))):
     """
     翻译（自动分类或手动指定角色）
     
     Args:
         request: 翻译请求
+        http_request: 原始 HTTP 请求（用于检测客户端断开）
         
     Returns:
         SSE 流式响应
     """
-    if not request.text or len(request.text.strip()) < 5:
-        raise HTTPException(
-            status_code=400,
-            detail="输入内容过短，至少需要5个字符"
-        )
+    if _too_short(request.text):
+        return _short_input_response()
     
     # 记录用户选择的模式
     if not request.source_role or not request.target_role:
         mode_info = "自动识别"
-        logger.info(f"[翻译模式] {mode_info} | 输入: {request.text[:50]}...")
+        logger.info("[翻译模式] %s | 输入: %s...", mode_info, request.text[:50])
     else:
         mode_info = f"{request.source_role.upper()} → {request.target_role.upper()}"
-        logger.info(f"[翻译模式] {mode_info} | 输入: {request.text[:50]}...")
+        logger.info("[翻译模式] %s | 输入: %s...", mode_info, request.text[:50])
     
     # 如果没有指定角色，先分类
     if not request.source_role or not request.target_role:
@@ -72,14 +212,9 @@ async def translate(request: TranslateRequest):
         # 根据 action 决定下一步
         if classification.action == "clarify":
             # 需要澄清
-            logger.info(f"[自动识别结果] 需要澄清 | 原因: {classification.reasoning}")
+            logger.info("[自动识别结果] 需要澄清 | 原因: %s", classification.reasoning)
             async def clarify_response():
-                yield "data: [输入信息不足]\n\n"
-                yield "data: \n\n"
-                yield "data: 为了更好地帮助您，请补充：\n\n"
-                yield "data: 1. 如果这是产品需求，请说明：想解决什么问题？预期目标？\n\n"
-                yield "data: 2. 如果这是技术方案，请说明：改动背景？解决什么问题？\n\n"
-                yield "data: [END]\n\n"
+                yield _CLARIFY_SSE
             
             return StreamingResponse(
                 clarify_response(),
@@ -88,13 +223,9 @@ async def translate(request: TranslateRequest):
         
         elif classification.action == "split":
             # 需要拆分话题
-            logger.info(f"[自动识别结果] 需要拆分话题 | 原因: {classification.reasoning}")
+            logger.info("[自动识别结果] 需要拆分话题 | 原因: %s", classification.reasoning)
             async def split_response():
-                yield "data: [检测到多个话题]\n\n"
-                yield "data: \n\n"
-                yield f"data: 建议分别讨论以下话题：\n\n"
-                yield "data: 请选择其中一个话题重新输入。\n\n"
-                yield "data: [END]\n\n"
+                yield _SPLIT_SSE
             
             return StreamingResponse(
                 split_response(),
@@ -118,7 +249,9 @@ async def translate(request: TranslateRequest):
             )
         
         source_role, target_role = role_pair
-        logger.info(f"[自动识别结果] 分类: {classification.type} (置信度: {classification.confidence:.0%}) → {source_role.upper()} → {target_role.upper()}")
+        logger.info("[自动识别结果] 分类: %s (置信度: %.0f%%) → %s → %s",
+                    classification.type, classification.confidence * 100,
+                    source_role.upper(), target_role.upper())
         
         # 保存分类信息用于后续传递
         mode = "auto"
@@ -134,40 +267,64 @@ async def translate(request: TranslateRequest):
     
     # 流式翻译
     async def generate():
+        queue = asyncio.Queue(maxsize=_STREAM_QUEUE_SIZE)
+        producer = asyncio.create_task(_produce(
+            translate_stream(
+                request.text, 
+                source_role, 
+                target_role,
+                mode=mode,
+                classification_type=classification_type,
+                classification_confidence=classification_confidence
+            ),
+            queue
+        ))
+        
         try:
             # 发送初始连接确认（强制开始流式传输）
-            yield ": connected\n\n"
+            yield _SSE_CONNECTED
             
             # 先发送分类信息（如果是自动分类的）
             if classification:
                 # 发送分类结果，后面加两个空行分隔
-                yield f"data: [分类结果: {classification.type} (置信度: {classification.confidence:.0%})]\n"
-                yield "data: \n"
-                yield "\n"
-                await asyncio.sleep(0)  # 让出控制权，立即发送
+                yield (
+                    f"data: [分类结果: {classification.type} (置信度: {classification.confidence:.0%})]\n"
+                    "data: \n"
+                    "\n"
+                ).encode()
             
             # 发送翻译结果
-            async for chunk in translate_stream(
-                request.text, 
-                source_role, 
-                target_role,
-                mode=mode,
-                classification_type=classification_type,
-                classification_confidence=classification_confidence
-            ):
+            chunk_count = 0
+            while True:
+                chunk = await queue.get()
+                if chunk is _STREAM_END:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                
+                # 客户端已断开则停止读取上游
+                chunk_count += 1
+                if chunk_count % _DISCONNECT_CHECK_INTERVAL == 0 and await http_request.is_disconnected():
+                    logger.info("[翻译中断] 客户端已断开 | 已发送 %d 个 chunk", chunk_count)
+                    return
+                
                 # SSE规范：如果chunk包含换行符，必须拆分成多个data:行
                 # 前端会自动用\n连接连续的data:行
-                for line in chunk.split('\n'):
-                    yield f"data: {line}\n"
-                yield "\n"  # 消息结束
-                await asyncio.sleep(0)  # 立即发送，不缓冲
+                # 每个 chunk 拼成一整帧并只编码一次，直接以 bytes 交给 StreamingResponse
+                if '\n' in chunk:
+                    chunk = chunk.replace('\n', '\ndata: ')
+                yield f"data: {chunk}\n\n".encode()
                 
             # 结束标记
-            yield "data: [END]\n\n"
+            yield _SSE_END
             
         except Exception as e:
-            yield f"data: \n\n[错误] {str(e)}\n\n"
-            yield "data: [END]\n\n"
+            yield f"data: \n\n[错误] {str(e)}\n\n".encode()
+            yield _SSE_END
+        
+        finally:
+            # 提前结束（断开/异常）时取消上游，释放 LLM 连接
+            producer.cancel()
     
     return StreamingResponse(
         generate(),
@@ -2,12 +2,14 @@
 Business Services
 业务逻辑服务
 """
-from .skill_service import read_skill
-from .llm_service import get_llm_client, classify_input, translate_stream
+from .skill_service import read_skill, warm_prompts
+from .llm_service import get_llm_client, close_llm_client, classify_input, translate_stream
 
 __all__ = [
     "read_skill",
+    "warm_prompts",
     "get_llm_client",
+    "close_llm_client",
     "classify_input",
     "translate_stream",
 ]
@@ -2,12 +2,18 @@
 LLM Service
 LLM 交互服务
 """
-import json
+import asyncio
+import itertools
 import logging
+import os
+import re
+import time
+from pathlib import Path
 from typing import AsyncIterator
-from datetime import datetime
 
-from anthropic import Anthropic, APIError
+import httpx
+import orjson
+from anthropic import AsyncAnthropic, APIError
 from fastapi import HTTPException
 
 from config import settings
@@ -18,28 +24,92 @@ from app.services.skill_service import read_skill
 # 获取日志器（FastAPI 标准方式）
 logger = logging.getLogger(__name__)
 
+# 分类结果中的 JSON 代码块（```json ... ``` 或 ``` ... ```）
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.S)
 
-def get_llm_client() -> Anthropic:
+# 没有代码块时，取第一个 { 到最后一个 } 之间的内容（去掉模型附带的说明文字）
+_JSON_OBJECT = re.compile(r"\{.*\}", re.S)
+
+# 请求 ID 序号（同一纳秒内的多个请求也不会重复）
+_req_counter = itertools.count()
+
+# 进行中的分类任务 {输入文本: Task}，相同输入的并发请求共享同一次 LLM 调用
+_inflight_classify: dict[str, asyncio.Task] = {}
+
+# LLM 客户端单例（首次使用时创建，所有请求复用同一个连接池）
+_client: AsyncAnthropic = None
+
+
+def get_llm_client() -> AsyncAnthropic:
     """获取 LLM 客户端（智谱 GLM-4.6，使用 Anthropic API 格式）"""
-    return Anthropic(
-        base_url=settings.llm_base_url,
-        api_key=settings.llm_api_key
-    )
+    global _client
+    if _client is None:
+        # 共享的 HTTP/2 连接池：保持长连接，并发请求复用同一连接，省去每次 TLS 握手
+        http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+        _client = AsyncAnthropic(
+            base_url=settings.llm_base_url,
+            api_key=settings.llm_api_key,
+            max_retries=2,
+            http_client=http_client
+        )
+    return _client
+
+
+async def close_llm_client():
+    """关闭 LLM 客户端及其 HTTP 连接池（应用关闭时调用）"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def _new_request_id() -> str:
+    """生成请求 ID：纳秒时间戳 + 自增序号（十六进制），按时间有序且进程内唯一"""
+    return f"{time.time_ns():x}{next(_req_counter):x}"
 
 
 async def classify_input(text: str) -> ClassificationResult:
     """
     分类用户输入
     
+    相同文本的并发请求合并为一次 LLM 调用，结果（或异常）由所有等待者共享；
+    调用结束后即从进行中表移除，不做结果缓存
+    
     Args:
         text: 用户输入内容
         
     Returns:
         分类结果
     """
-    request_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    task = _inflight_classify.get(text)
+    if task is None:
+        task = asyncio.ensure_future(_classify(text))
+        _inflight_classify[text] = task
+        task.add_done_callback(lambda _: _inflight_classify.pop(text, None))
+    else:
+        logger.info("[CLASSIFY JOIN] 复用进行中的分类请求 | Input: %s...", text[:50])
     
-    logger.info(f"[CLASSIFY REQUEST] ID: {request_id}, Input: {text[:50]}...")
+    # shield：某个客户端断开（取消）时不影响其他等待同一结果的请求
+    return await asyncio.shield(task)
+
+
+async def _classify(text: str) -> ClassificationResult:
+    """
+    调用 LLM 分类用户输入
+    
+    Args:
+        text: 用户输入内容
+        
+    Returns:
+        分类结果
+    """
+    request_id = _new_request_id()
+    
+    logger.info("[CLASSIFY REQUEST] ID: %s, Input: %s...", request_id, text[:50])
     
     # 读取分类器 Skill
     classifier_prompt = read_skill("classifier")
@@ -48,7 +118,7 @@ async def classify_input(text: str) -> ClassificationResult:
     client = get_llm_client()
     
     try:
-        message = client.messages.create(
+        message = await client.messages.create(
             model=settings.llm_model,
             max_tokens=1000,
             system=classifier_prompt,
@@ -60,31 +130,31 @@ async def classify_input(text: str) -> ClassificationResult:
         # 解析 JSON 结果
         result_text = message.content[0].text
         
-        # 尝试提取 JSON（可能包含在 ```json 代码块中）
-        if "```json" in result_text:
-            json_start = result_text.find("```json") + 7
-            json_end = result_text.find("```", json_start)
-            result_text = result_text[json_start:json_end].strip()
-        elif "```" in result_text:
-            json_start = result_text.find("```") + 3
-            json_end = result_text.find("```", json_start)
-            result_text = result_text[json_start:json_end].strip()
+        # 尝试提取 JSON（可能包含在 ```json 代码块中，或前后带有说明文字）
+        m = _JSON_FENCE.search(result_text)
+        if m:
+            result_text = m.group(1)
+        else:
+            m = _JSON_OBJECT.search(result_text)
+            if m:
+                result_text = m.group(0)
         
-        result_json = json.loads(result_text)
+        result_json = orjson.loads(result_text)
         
-        logger.info(f"[CLASSIFY SUCCESS] Type: {result_json.get('type')}, Confidence: {result_json.get('confidence')}, "
-                   f"Tokens: {message.usage.input_tokens}/{message.usage.output_tokens}")
+        logger.info("[CLASSIFY SUCCESS] Type: %s, Confidence: %s, Tokens: %s/%s",
+                    result_json.get('type'), result_json.get('confidence'),
+                    message.usage.input_tokens, message.usage.output_tokens)
         
-        return ClassificationResult(**result_json)
+        return ClassificationResult.model_validate(result_json)
         
-    except json.JSONDecodeError as e:
-        logger.error(f"[CLASSIFY ERROR] JSON Parse Failed: {str(e)}, Response: {result_text[:200]}")
+    except orjson.JSONDecodeError as e:
+        logger.error("[CLASSIFY ERROR] JSON Parse Failed: %s, Response: %s", e, result_text[:200])
         raise HTTPException(
             status_code=500,
             detail=f"分类结果JSON解析失败: {str(e)}\n原始响应: {result_text[:200]}"
         )
     except APIError as e:
-        logger.error(f"[CLASSIFY ERROR] API Error: {str(e)}")
+        logger.error("[CLASSIFY ERROR] API Error: %s", e)
         raise HTTPException(
             status_code=503,
             detail=f"LLM API 调用失败: {str(e)}"
@@ -107,6 +177,78 @@ def format_output_chunk(chunk: str) -> str:
     return chunk
 
 
+def _dump_llm_output(
+    request_id: str,
+    text: str,
+    source_role: str,
+    target_role: str,
+    mode: str,
+    classification_type: str,
+    classification_confidence: float,
+    translator_prompt: str,
+    complete_output: str,
+    chunk_count: int,
+    total_length: int,
+    logs_dir: Path = None
+) -> Path:
+    """
+    把一次翻译的 System Prompt、完整输出和统计信息写入单独的文件
+    
+    Args:
+        logs_dir: 输出目录，默认为 settings.logs_dir
+    
+    Returns:
+        输出文件路径
+    """
+    output_file = (logs_dir or settings.logs_dir) / f"llm_output_{request_id}.txt"
+    
+    # 构建分类信息（如果是自动识别）
+    classification_info = ""
+    if mode == 'auto' and classification_type:
+        classification_info = f"Classification Type: {classification_type}"
+        if classification_confidence is not None:
+            classification_info += f" (置信度: {classification_confidence:.0%})"
+    
+    # 先在内存中拼好全部内容，再一次性写入文件
+    separator = '=' * 80
+    parts = [
+        separator,
+        f"Request ID: {request_id}",
+        f"Mode: {'自动识别' if mode == 'auto' else '手动选择'}",
+    ]
+    if classification_info:
+        parts.append(classification_info)
+    parts += [
+        f"Translation: {source_role.upper()} → {target_role.upper()}",
+        f"User Input: {text}",
+        separator,
+        "",
+        "【System Prompt】",
+        "",
+        translator_prompt,
+        "",
+        separator,
+        "",
+        "【LLM 完整输出】",
+        "",
+        complete_output,
+        "",
+        separator,
+        "【输出统计】",
+        f"总 Chunk 数: {chunk_count}",
+        f"总字符数: {total_length}",
+        f"换行符数量: {complete_output.count(chr(10))}",
+        separator,
+    ]
+    
+    # 先写临时文件再替换，避免留下写了一半的输出文件
+    tmp_file = output_file.with_suffix('.tmp')
+    tmp_file.write_text('\n'.join(parts) + '\n', encoding='utf-8')
+    os.replace(tmp_file, output_file)
+    
+    return output_file
+
+
 async def translate_stream(
     text: str, 
     source_role: str, 
@@ -129,9 +271,10 @@ async def translate_stream(
     Yields:
         翻译结果的文本片段
     """
-    request_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    request_id = _new_request_id()
     
-    logger.info(f"[TRANSLATE REQUEST] ID: {request_id}, {source_role.upper()} → {target_role.upper()}, Input: {text[:50]}...")
+    logger.info("[TRANSLATE REQUEST] ID: %s, %s → %s, Input: %s...",
+                request_id, source_role.upper(), target_role.upper(), text[:50])
     
     # 读取翻译 Skill（translator + roles）
     translator_prompt = read_skill("translator", source_role, target_role)
@@ -144,7 +287,7 @@ async def translate_stream(
     full_output = []  # 记录完整输出
     
     try:
-        with client.messages.stream(
+        async with client.messages.stream(
             model=settings.llm_model,
             max_tokens=4000,
             system=translator_prompt,
@@ -152,7 +295,7 @@ async def translate_stream(
                 {"role": "user", "content": text}
             ]
         ) as stream:
-            for text_chunk in stream.text_stream:
+            async for text_chunk in stream.text_stream:
                 chunk_count += 1
                 total_length += len(text_chunk)
                 
@@ -160,71 +303,30 @@ async def translate_stream(
                 formatted = format_output_chunk(text_chunk)
                 
                 # 保存到完整输出
-                full_output.append(formatted)
+                if settings.dump_llm_output:
+                    full_output.append(formatted)
                 
                 yield formatted
             
-            # 记录完整输出到单独的文件
-            complete_output = ''.join(full_output)
-            output_file = settings.logs_dir / f"llm_output_{request_id}.txt"
-            
-            # 构建分类信息（如果是自动识别）
-            classification_info = ""
-            if mode == 'auto' and classification_type:
-                classification_info = f"Classification Type: {classification_type}"
-                if classification_confidence is not None:
-                    classification_info += f" (置信度: {classification_confidence:.0%})"
-                classification_info += "\n"
-            
-            # 使用 logging 写入（创建独立的 FileHandler）
-            llm_file_logger = logging.getLogger(f"llm_output_{request_id}")
-            llm_file_logger.setLevel(logging.INFO)
-            llm_file_logger.propagate = False  # 不传播到父 logger
-            
-            # 创建文件处理器（无格式化，直接写入原始内容）
-            file_handler = logging.FileHandler(output_file, mode='w', encoding='utf-8')
-            file_handler.setFormatter(logging.Formatter('%(message)s'))  # 只输出消息本身
-            llm_file_logger.addHandler(file_handler)
-            
-            # 写入日志内容
-            llm_file_logger.info('=' * 80)
-            llm_file_logger.info(f"Request ID: {request_id}")
-            llm_file_logger.info(f"Mode: {'自动识别' if mode == 'auto' else '手动选择'}")
-            if classification_info:
-                llm_file_logger.info(classification_info.rstrip('\n'))
-            llm_file_logger.info(f"Translation: {source_role.upper()} → {target_role.upper()}")
-            llm_file_logger.info(f"User Input: {text}")
-            llm_file_logger.info('=' * 80)
-            llm_file_logger.info("")
-            llm_file_logger.info("【System Prompt】")
-            llm_file_logger.info("")
-            llm_file_logger.info(translator_prompt)
-            llm_file_logger.info("")
-            llm_file_logger.info('=' * 80)
-            llm_file_logger.info("")
-            llm_file_logger.info("【LLM 完整输出】")
-            llm_file_logger.info("")
-            llm_file_logger.info(complete_output)
-            llm_file_logger.info("")
-            llm_file_logger.info('=' * 80)
-            llm_file_logger.info("【输出统计】")
-            llm_file_logger.info(f"总 Chunk 数: {chunk_count}")
-            llm_file_logger.info(f"总字符数: {total_length}")
-            llm_file_logger.info(f"换行符数量: {complete_output.count(chr(10))}")
-            llm_file_logger.info('=' * 80)
-            
-            # 清理 handler，避免内存泄漏
-            file_handler.close()
-            llm_file_logger.removeHandler(file_handler)
+            # 记录完整输出到单独的文件（仅在开启 dump_llm_output 时）
+            output_name = "-"
+            if settings.dump_llm_output:
+                output_file = _dump_llm_output(
+                    request_id, text, source_role, target_role, mode,
+                    classification_type, classification_confidence,
+                    translator_prompt, ''.join(full_output), chunk_count, total_length
+                )
+                output_name = output_file.name
             
             # 记录最终使用情况
-            final_message = stream.get_final_message()
+            final_message = await stream.get_final_message()
             if final_message:
-                logger.info(f"[TRANSLATE SUCCESS] Chunks: {chunk_count}, Chars: {total_length}, "
-                           f"Tokens: {final_message.usage.input_tokens}/{final_message.usage.output_tokens}, "
-                           f"Output: {output_file.name}")
+                logger.info("[TRANSLATE SUCCESS] Chunks: %d, Chars: %d, Tokens: %s/%s, Output: %s",
+                            chunk_count, total_length,
+                            final_message.usage.input_tokens, final_message.usage.output_tokens,
+                            output_name)
                 
     except APIError as e:
-        logger.error(f"[TRANSLATE ERROR] {str(e)}")
+        logger.error("[TRANSLATE ERROR] %s", e)
         yield f"\n\n[错误] LLM API 调用失败: {str(e)}"
 
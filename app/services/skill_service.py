@@ -2,8 +2,9 @@
 Skill Service
 技能读取与提示词组装服务
 """
+import functools
 import logging
-from pathlib import Path
+import re
 from fastapi import HTTPException
 
 from config import settings
@@ -12,8 +13,82 @@ from config import settings
 # 获取日志器
 logger = logging.getLogger(__name__)
 
+# 主 Prompt 中的占位符，如 {{SOURCE_ROLE}}
+_TPL_RE = re.compile(r"\{\{(\w+)\}\}")
+
+# 启动时预加载的 Prompt 片段 {相对 ai_context_dir 的 POSIX 路径: 内容}，如 "prompts/translator.md"
+_PROMPT_CACHE: dict[str, str] = {}
+
+
+def warm_prompts():
+    """
+    预加载 ai_context_dir 下的所有 Markdown 文件到内存（应用启动时调用）
+    请求处理时直接按相对路径查字典，不再在事件循环上读文件
+    """
+    _PROMPT_CACHE.clear()
+    for path in settings.ai_context_dir.rglob("*.md"):
+        _PROMPT_CACHE[path.relative_to(settings.ai_context_dir).as_posix()] = path.read_text(encoding="utf-8")
+    
+    # 文件内容可能已变化，丢弃之前组装好的结果
+    _build_skill.cache_clear()
+    
+    # 预先组装分类器和所有角色组合的翻译 Prompt，首个请求也不需要组装
+    # 参数与 read_skill 的调用方式保持一致（lru_cache 按实际传入的参数区分缓存键）
+    _build_skill("classifier", None, None)
+    roles = sorted(path.stem for path in (settings.modules_dir / "roles").glob("*.md"))
+    for source_role in roles:
+        for target_role in roles:
+            if source_role != target_role:
+                _build_skill("translator", source_role, target_role)
+    
+    logger.info("Prompt files loaded: %d, skills built: %d",
+                len(_PROMPT_CACHE), _build_skill.cache_info().currsize)
+
+
+def _read_prompt_file(name: str) -> str:
+    """
+    读取 Prompt 文件内容，优先使用预加载的内容
+    debug 模式下总是读磁盘，便于修改后立即生效
+    
+    Args:
+        name: 相对 ai_context_dir 的 POSIX 路径，如 "prompts/translator.md"
+        
+    Returns:
+        文件内容；文件不存在时返回 None
+    """
+    if not settings.debug:
+        content = _PROMPT_CACHE.get(name)
+        if content is not None:
+            return content
+    
+    path = settings.ai_context_dir / name
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8")
+
 
 def read_skill(skill_name: str, source_role: str = None, target_role: str = None) -> str:
+    """
+    读取 Skill 提示词
+    
+    组装结果按 (skill_name, source_role, target_role) 缓存，Prompt 文件在进程内视为不变；
+    debug 模式下跳过缓存，修改 Prompt 文件后无需重启即可生效
+    
+    Args:
+        skill_name: skill 文件名（不含 .md），如 "classifier", "translator"
+        source_role: 源角色（如 "pm", "dev"），仅用于 translator
+        target_role: 目标角色（如 "dev", "pm"），仅用于 translator
+        
+    Returns:
+        完整的Skill提示词
+    """
+    if settings.debug:
+        return _build_skill.__wrapped__(skill_name, source_role, target_role)
+    return _build_skill(skill_name, source_role, target_role)
+
+
+@functools.lru_cache(maxsize=64)
+def _build_skill(skill_name: str, source_role: str = None, target_role: str = None) -> str:
     """
     基于主 Prompt + 模块注入生成完整的 prompt（综合版本）
     
@@ -36,15 +111,13 @@ def read_skill(skill_name: str, source_role: str = None, target_role: str = None
     
     # 对于 classifier
     if skill_name == 'classifier':
-        classifier_file = settings.prompts_dir / "classifier.md"
-        if classifier_file.exists():
-            with open(classifier_file, 'r', encoding='utf-8') as f:
-                return f.read()
-        else:
+        classifier_prompt = _read_prompt_file("prompts/classifier.md")
+        if classifier_prompt is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"Classifier 文件不存在"
             )
+        return classifier_prompt
     
     # 对于 translator，使用主 Prompt + 模块注入
     if skill_name == 'translator':
@@ -54,61 +127,53 @@ def read_skill(skill_name: str, source_role: str = None, target_role: str = None
                 detail="translator 需要指定 source_role 和 target_role"
             )
         
-        logger.debug(f"Loading translator skill: {source_role} -> {target_role}")
+        logger.debug("Loading translator skill: %s -> %s", source_role, target_role)
         
         # 1. 读取主 Prompt
-        main_prompt_file = settings.prompts_dir / "translator.md"
-        if not main_prompt_file.exists():
-            logger.error(f"Main prompt file not found: {main_prompt_file}")
+        prompt = _read_prompt_file("prompts/translator.md")
+        if prompt is None:
+            logger.error("Main prompt file not found: %s", settings.prompts_dir / "translator.md")
             raise HTTPException(
                 status_code=404,
                 detail=f"主 Prompt 文件不存在: translator.md"
             )
         
-        with open(main_prompt_file, 'r', encoding='utf-8') as f:
-            prompt = f.read()
-        
-        logger.debug(f"Loaded main prompt: {len(prompt)} chars")
+        logger.debug("Loaded main prompt: %d chars", len(prompt))
         
         # 2. 读取模块内容
         # 源角色
-        source_role_file = settings.modules_dir / "roles" / f"{source_role}.md"
-        if not source_role_file.exists():
+        source_role_content = _read_prompt_file(f"modules/roles/{source_role}.md")
+        if source_role_content is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"角色文件不存在: {source_role}"
             )
-        with open(source_role_file, 'r', encoding='utf-8') as f:
-            source_role_content = f.read()
         
         # 目标角色
-        target_role_file = settings.modules_dir / "roles" / f"{target_role}.md"
-        if not target_role_file.exists():
+        target_role_content = _read_prompt_file(f"modules/roles/{target_role}.md")
+        if target_role_content is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"角色文件不存在: {target_role}"
             )
-        with open(target_role_file, 'r', encoding='utf-8') as f:
-            target_role_content = f.read()
         
         # 格式规则
-        rules_file = settings.modules_dir / "rules" / "format-rules.md"
-        if not rules_file.exists():
+        rules_content = _read_prompt_file("modules/rules/format-rules.md")
+        if rules_content is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"规则文件不存在: format-rules.md"
             )
-        with open(rules_file, 'r', encoding='utf-8') as f:
-            rules_content = f.read()
-        
-        # 3. 替换变量
-        prompt = prompt.replace("{{SOURCE_ROLE}}", source_role.upper())
-        prompt = prompt.replace("{{TARGET_ROLE}}", target_role.upper())
-        prompt = prompt.replace("{{SOURCE_ROLE_CONTENT}}", source_role_content)
-        prompt = prompt.replace("{{TARGET_ROLE_CONTENT}}", target_role_content)
-        prompt = prompt.replace("{{FORMAT_RULES}}", rules_content)
         
-        return prompt
+        # 3. 替换变量（一次扫描完成全部替换，未知占位符保持原样）
+        mapping = {
+            "SOURCE_ROLE": source_role.upper(),
+            "TARGET_ROLE": target_role.upper(),
+            "SOURCE_ROLE_CONTENT": source_role_content,
+            "TARGET_ROLE_CONTENT": target_role_content,
+            "FORMAT_RULES": rules_content,
+        }
+        return _TPL_RE.sub(lambda m: mapping.get(m.group(1), m.group(0)), prompt)
     
     # 其他 skill（目前不支持）
     raise HTTPException(
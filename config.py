@@ -2,12 +2,54 @@
 Configuration Management
 配置管理模块 - 使用 Pydantic Settings（FastAPI 推荐方式）
 """
+import math
+import os
 from pathlib import Path
 from typing import List
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+# 项目目录（不依赖任何配置项，导入时计算一次）
+_PROJECT_ROOT = Path(__file__).parent
+_AI_CONTEXT_DIR = _PROJECT_ROOT / "ai-context"
+_PROMPTS_DIR = _AI_CONTEXT_DIR / "prompts"
+_MODULES_DIR = _AI_CONTEXT_DIR / "modules"
+_STATIC_DIR = _PROJECT_ROOT / "static"
+_LOGS_DIR = _PROJECT_ROOT / "logs"
+
+
+def _available_cpu_count() -> int:
+    """
+    当前进程可用的 CPU 数
+    os.cpu_count() 返回宿主机核数，这里还考虑 CPU 亲和性和容器（cgroup）的 CPU 配额
+    """
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Windows / macOS 没有 sched_getaffinity
+        count = os.cpu_count() or 1
+    
+    # cgroup v2: "<quota> <period>" 或 "max <period>"
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+        if quota != "max":
+            count = min(count, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    
+    # cgroup v1: quota 为 -1 表示不限制
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if quota > 0 and period > 0:
+            count = min(count, math.ceil(quota / period))
+    except (OSError, ValueError):
+        pass
+    
+    return max(1, count)
+
+
 class Settings(BaseSettings):
     """
     应用配置类
@@ -29,6 +71,16 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     debug: bool = False
+    workers: int = 1  # uvicorn worker 进程数，0 表示按可用 CPU 数自动选择（debug 模式下固定单进程 + 热重载）
+    
+    @property
+    def worker_count(self) -> int:
+        """实际启动的 worker 进程数"""
+        if self.debug:
+            return 1
+        if self.workers > 0:
+            return self.workers
+        return max(1, _available_cpu_count() // 2)
     
     # ============================================================================
     # 日志配置
@@ -37,6 +89,9 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     log_file: str = "logs/app.log"
     log_backup_count: int = 30  # 保留多少天的日志
+    log_rotate_externally: bool = False  # 由 logrotate 等外部工具轮转日志（使用 WatchedFileHandler）
+    log_queue_size: int = 10000  # 待写入日志的队列上限，超出时丢弃
+    dump_llm_output: bool = False  # 是否把每次翻译的 Prompt 和完整输出写入 logs/llm_output_*.txt
     
     # ============================================================================
     # CORS 配置
@@ -44,6 +99,7 @@ class Settings(BaseSettings):
     
     allow_origins: str = "*"  # 逗号分隔的源列表，或使用 "*" 允许所有
     allow_credentials: bool = True
+    cors_max_age: int = 86400  # 预检结果的浏览器缓存时间（秒），期间同类请求不再发送 OPTIONS
     
     @property
     def allow_origins_list(self) -> List[str]:
@@ -64,38 +120,38 @@ class Settings(BaseSettings):
     )
     
     # ============================================================================
-    # 路径属性（动态计算）
+    # 路径属性（项目目录在导入时已计算，这里直接返回）
     # ============================================================================
     
     @property
     def project_root(self) -> Path:
         """项目根目录"""
-        return Path(__file__).parent
+        return _PROJECT_ROOT
     
     @property
     def ai_context_dir(self) -> Path:
         """AI Context 目录"""
-        return self.project_root / "ai-context"
+        return _AI_CONTEXT_DIR
     
     @property
     def prompts_dir(self) -> Path:
         """Prompts 目录"""
-        return self.ai_context_dir / "prompts"
+        return _PROMPTS_DIR
     
     @property
     def modules_dir(self) -> Path:
         """Modules 目录"""
-        return self.ai_context_dir / "modules"
+        return _MODULES_DIR
     
     @property
     def static_dir(self) -> Path:
         """Static 目录"""
-        return self.project_root / "static"
+        return _STATIC_DIR
     
     @property
     def logs_dir(self) -> Path:
         """日志目录"""
-        return self.project_root / "logs"
+        return _LOGS_DIR
     
     @property
     def log_file_path(self) -> Path:
@@ -147,6 +203,7 @@ class Settings(BaseSettings):
         print(f"Host: {self.host}")
         print(f"Port: {self.port}")
         print(f"Debug: {self.debug}")
+        print(f"Workers: {self.worker_count}")
         print(f"Log Level: {self.log_level}")
         print(f"AI Context Dir: {self.ai_context_dir}")
         print("="*80)
@@ -11,15 +11,18 @@ FastAPI 规范架构：
 """
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.openapi.constants import REF_PREFIX
+from fastapi.openapi.utils import validation_error_definition, validation_error_response_definition
 
 from config import settings
-from app.core.logging import setup_logging, get_logger
+from app.core.logging import setup_logging, shutdown_logging, get_logger
 from app.core.middleware import RequestLoggingMiddleware
+from app.core.static_assets import StaticAsset, precompress_static, build_manifest, asset_response
 from app.routers import api
+from app.services import get_llm_client, close_llm_client, warm_prompts
 
 
 # ============================================================================
@@ -39,6 +42,9 @@ logger = get_logger(__name__)
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # Startup
+    # 确保日志已配置（上一次 lifespan 关闭时会停止后台日志线程）
+    setup_logging()
+    
     logger.info("="*80)
     logger.info("Communication Translator - 启动中...")
     logger.info("="*80)
@@ -48,6 +54,18 @@ async def lifespan(app: FastAPI):
         logger.error("配置验证失败，请检查配置")
         raise RuntimeError("配置验证失败")
     
+    # 预加载 Prompt 文件并组装好常用 Prompt，请求处理时不再读磁盘
+    warm_prompts()
+    
+    # 创建 LLM 客户端（所有请求共用同一个连接池）
+    get_llm_client()
+    
+    # 生成 .br / .gz 预压缩文件，并预加载静态文件（原始内容 + 预压缩内容 + ETag）
+    # 调试模式下文件频繁修改，不做高压缩级别的预压缩
+    if not settings.debug:
+        precompress_static(settings.static_dir)
+    app.state.static_manifest = build_manifest(settings.static_dir, compress=not settings.debug)
+    
     logger.info(f"✅ LLM Model: {settings.llm_model}")
     logger.info(f"✅ Server: {settings.host}:{settings.port}")
     logger.info(f"✅ AI Context Dir: {settings.ai_context_dir}")
@@ -55,12 +73,19 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Communication Translator 启动成功")
     logger.info("="*80)
     
-    yield
-    
-    # Shutdown
-    logger.info("="*80)
-    logger.info("Communication Translator - 正在关闭...")
-    logger.info("="*80)
+    try:
+        yield
+    finally:
+        # Shutdown（即使运行中出现异常也会释放资源）
+        logger.info("="*80)
+        logger.info("Communication Translator - 正在关闭...")
+        logger.info("="*80)
+        
+        # 关闭 LLM 客户端连接池
+        await close_llm_client()
+        
+        # 写完队列中剩余日志并停止后台日志线程
+        shutdown_logging()
 
 
 # ============================================================================
@@ -74,6 +99,7 @@ app = FastAPI(
     docs_url="/docs" if settings.debug else None,
     redoc_url="/redoc" if settings.debug else None,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS配置（从 settings 读取）
@@ -83,6 +109,7 @@ app.add_middleware(
     allow_credentials=settings.allow_credentials,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=settings.cors_max_age,
 )
 
 # 请求日志中间件
@@ -95,28 +122,72 @@ app.add_middleware(RequestLoggingMiddleware)
 
 app.include_router(api.router)
 
+_default_openapi = app.openapi
+
+
+def openapi() -> dict:
+    """
+    生成 OpenAPI 文档
+    请求体由依赖解析（见 api._json_body），FastAPI 不会自动注册请求体模型和 422 响应模型，这里补充到 components
+    """
+    if app.openapi_schema:
+        return app.openapi_schema
+    
+    schema = _default_openapi()
+    schemas = schema.setdefault("components", {}).setdefault("schemas", {})
+    schemas.setdefault("ValidationError", validation_error_definition)
+    schemas.setdefault("HTTPValidationError", validation_error_response_definition)
+    for model in api.REQUEST_BODY_MODELS:
+        schemas[model.__name__] = model.model_json_schema(ref_template=REF_PREFIX + "{model}")
+    return schema
+
+
+app.openapi = openapi
+
 
 # ============================================================================
 # Static Files & Root Routes
 # ============================================================================
 
-# 挂载静态文件
-app.mount("/static", StaticFiles(directory=str(settings.static_dir)), name="static")
+def get_static_manifest(request: Request) -> dict[str, StaticAsset]:
+    """
+    获取静态资源清单（启动时已生成）
+    未经过 lifespan 启动（如测试）时生成清单；
+    调试模式下重新扫描目录，只重新读取有变化的文件（不压缩），便于修改后立即生效
+    """
+    manifest = getattr(request.app.state, "static_manifest", None)
+    if manifest is None:
+        manifest = build_manifest(settings.static_dir, compress=not settings.debug)
+        request.app.state.static_manifest = manifest
+    elif settings.debug:
+        manifest = build_manifest(settings.static_dir, compress=False, previous=manifest)
+        request.app.state.static_manifest = manifest
+    return manifest
+
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_files(path: str, request: Request):
+    """返回静态文件（从内存清单中查找）"""
+    asset = get_static_manifest(request).get(path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    # 静态资源文件名不带内容哈希，用 ETag 协商缓存，更新后立即生效
+    return asset_response(request, asset, "no-cache")
 
 
 @app.get("/", response_class=HTMLResponse)
-async def root():
-    """返回前端页面"""
-    html_file = settings.static_dir / "index.html"
-    
-    if not html_file.exists():
+async def root(request: Request):
+    """返回前端页面（内容在启动时已读入内存）"""
+    index_page = get_static_manifest(request).get("index.html")
+    if index_page is None:
         return HTMLResponse(
             content="<h1>Communication Translator</h1><p>前端页面未找到</p>",
             status_code=404
         )
     
-    with open(html_file, 'r', encoding='utf-8') as f:
-        return HTMLResponse(content=f.read())
+    # 每次都向服务器确认（ETag 未变化时返回 304），前端更新后立即生效
+    return asset_response(request, index_page, "no-cache")
 
 
 # ============================================================================
@@ -124,13 +195,19 @@ async def root():
 # ============================================================================
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
     
+    # uvloop + httptools 由 uvicorn[standard] 安装（Windows 下没有 uvloop）
+    # debug 模式：单进程 + 热重载；生产模式：多 worker 进程，不加载文件监控
     uvicorn.run(
         "main:app",
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
-        log_level=settings.log_level.lower()
+        workers=settings.worker_count,
+        log_level=settings.log_level.lower(),
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
     )
 
@@ -1,6 +1,7 @@
 """
 测试 API 端点
 """
+import asyncio
 import pytest
 from unittest.mock import patch, Mock, AsyncMock
 import json
@@ -19,6 +20,81 @@ class TestHealthEndpoint:
         assert "service" in data
 
 
+class TestRootPage:
+    """测试前端页面"""
+    
+    def test_root_page(self, client):
+        """测试返回前端页面"""
+        response = client.get("/")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/html")
+        assert "etag" in response.headers
+        assert "<html" in response.text.lower()
+    
+    def test_root_page_gzip(self, client):
+        """测试支持 gzip 的客户端获得压缩内容"""
+        response = client.get("/", headers={"Accept-Encoding": "gzip"})
+        
+        assert response.status_code == 200
+        assert response.headers.get("content-encoding") == "gzip"
+    
+    def test_root_page_brotli(self, client):
+        """测试支持 br 的客户端优先获得 brotli 压缩内容"""
+        response = client.get("/", headers={"Accept-Encoding": "gzip, br"})
+        
+        assert response.status_code == 200
+        assert response.headers.get("content-encoding") == "br"
+    
+    def test_root_page_not_modified(self, client):
+        """测试 ETag 未变化时返回 304"""
+        etag = client.get("/").headers["etag"]
+        
+        response = client.get("/", headers={"If-None-Match": etag})
+        
+        assert response.status_code == 304
+        assert response.content == b""
+
+
+class TestStaticFiles:
+    """测试静态文件"""
+    
+    def test_static_file(self, client):
+        """测试返回静态文件"""
+        response = client.get("/static/index.html")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/html")
+        assert "etag" in response.headers
+    
+    def test_static_file_not_found(self, client):
+        """测试不存在的静态文件"""
+        response = client.get("/static/not-exists.js")
+        
+        assert response.status_code == 404
+    
+    def test_static_path_traversal(self, client):
+        """测试不能访问静态目录以外的文件"""
+        # 编码后的 .. 不会被客户端折叠，请求会到达静态文件处理器
+        response = client.get("/static/%2e%2e/config.py")
+        
+        assert response.status_code == 404
+    
+    @pytest.mark.asyncio
+    async def test_static_handler_rejects_parent_path(self, client):
+        """测试静态文件处理器只从清单中查找，不解析 .. 路径"""
+        from fastapi import HTTPException
+        from main import app, static_files
+        
+        request = Mock()
+        request.app = app
+        
+        with pytest.raises(HTTPException) as exc_info:
+            await static_files("../config.py", request)
+        
+        assert exc_info.value.status_code == 404
+
+
 class TestClassifyEndpoint:
     """测试分类端点"""
     
@@ -133,6 +209,84 @@ class TestTranslateEndpoint:
         assert response.status_code == 200
         assert response.headers["content-type"] == "text/event-stream; charset=utf-8"
     
+    @patch('app.routers.api.translate_stream')
+    def test_translate_sse_framing(self, mock_translate, client, sample_pm_input):
+        """测试 SSE 分帧（多行 chunk 拆成多个 data: 行）"""
+        async def mock_stream(*args, **kwargs):
+            yield "第一行\n第二行"
+            yield "token"
+        
+        mock_translate.return_value = mock_stream()
+        
+        response = client.post(
+            "/api/translate",
+            json={
+                "text": sample_pm_input,
+                "source_role": "pm",
+                "target_role": "dev"
+            }
+        )
+        
+        assert response.status_code == 200
+        assert "data: 第一行\ndata: 第二行\n\n" in response.text
+        assert "data: token\n\n" in response.text
+        assert response.text.endswith("data: [END]\n\n")
+    
+    @patch('app.routers.api.translate_stream')
+    def test_translate_upstream_error(self, mock_translate, client, sample_pm_input):
+        """测试上游流出错时输出错误帧并正常结束"""
+        async def mock_stream(*args, **kwargs):
+            yield "部分输出"
+            raise RuntimeError("上游连接中断")
+        
+        mock_translate.return_value = mock_stream()
+        
+        response = client.post(
+            "/api/translate",
+            json={
+                "text": sample_pm_input,
+                "source_role": "pm",
+                "target_role": "dev"
+            }
+        )
+        
+        assert response.status_code == 200
+        assert "data: 部分输出\n\n" in response.text
+        assert "[错误] 上游连接中断" in response.text
+        assert response.text.endswith("data: [END]\n\n")
+    
+    @pytest.mark.asyncio
+    async def test_translate_client_disconnect(self, sample_pm_input):
+        """测试客户端断开后停止读取上游，关闭上游流且不留下后台任务"""
+        from app.models.schemas import TranslateRequest
+        from app.routers.api import translate, _DISCONNECT_CHECK_INTERVAL
+        
+        upstream = {"closed": False}
+        
+        async def endless_stream(*args, **kwargs):
+            try:
+                while True:
+                    yield "token"
+            finally:
+                upstream["closed"] = True
+        
+        http_request = Mock()
+        http_request.is_disconnected = AsyncMock(return_value=True)
+        request = TranslateRequest(text=sample_pm_input, source_role="pm", target_role="dev")
+        
+        with patch('app.routers.api.translate_stream', return_value=endless_stream()):
+            response = await translate(http_request, request)
+            frames = [frame async for frame in response.body_iterator]
+        
+        # 让被取消的上游任务执行完清理
+        for _ in range(3):
+            await asyncio.sleep(0)
+        
+        assert frames.count(b"data: token\n\n") == _DISCONNECT_CHECK_INTERVAL - 1
+        assert b"data: [END]\n\n" not in frames
+        assert upstream["closed"] is True
+        assert [task for task in asyncio.all_tasks() if task is not asyncio.current_task()] == []
+    
     def test_translate_short_input(self, client):
         """测试输入过短"""
         response = client.post(
@@ -142,6 +296,7 @@ class TestTranslateEndpoint:
         
         # 应该返回 400 (输入过短)
         assert response.status_code == 400
+        assert response.json() == {"detail": "输入内容过短，至少需要5个字符"}
     
     @patch('app.routers.api.classify_input')
     def test_translate_clarify_action(self, mock_classify, client, sample_short_input):
@@ -169,6 +324,17 @@ class TestTranslateEndpoint:
         # SSE 响应应该包含澄清提示
 
 
+class TestInputLength:
+    """测试输入长度校验"""
+    
+    def test_too_short(self):
+        """测试与 len(text.strip()) < 5 的判断一致"""
+        from app.routers.api import _too_short
+        
+        for text in ["", "短", "    ", "  abcd  ", "abcde", "  abcde", "a b c", "\n\n登录功能需求\n"]:
+            assert _too_short(text) == (len(text.strip()) < 5)
+
+
 class TestCORS:
     """测试 CORS 配置"""
     
@@ -195,6 +361,55 @@ class TestRequestValidation:
         
         assert response.status_code == 422
     
+    def test_non_json_content_type(self, client):
+        """测试非 JSON Content-Type 的请求体被拒绝"""
+        with patch('app.routers.api.classify_input') as mock_classify:
+            response = client.post(
+                "/api/classify",
+                content='{"text": "我们需要一个用户登录功能"}',
+                headers={"Content-Type": "text/plain"}
+            )
+        
+        assert response.status_code == 422
+        mock_classify.assert_not_called()
+    
+    def test_missing_content_type(self, client):
+        """测试缺少 Content-Type 的请求体被拒绝"""
+        response = client.post(
+            "/api/classify",
+            content='{"text": "我们需要一个用户登录功能"}'
+        )
+        
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["type"] == "content_type"
+    
+    def test_validation_error_format(self, client):
+        """测试校验错误格式与 FastAPI 默认一致"""
+        response = client.post(
+            "/api/classify",
+            json={}
+        )
+        
+        error = response.json()["detail"][0]
+        assert error["loc"] == ["body", "text"]
+        assert error["type"] == "missing"
+        assert "url" in error
+    
+    def test_openapi_request_bodies(self, client):
+        """测试 OpenAPI 文档包含请求体模型和 422 响应"""
+        schema = client.get("/openapi.json").json()
+        
+        components = schema["components"]["schemas"]
+        assert "ClassifyRequest" in components
+        assert "TranslateRequest" in components
+        assert "HTTPValidationError" in components
+        
+        operation = schema["paths"]["/api/classify"]["post"]
+        assert operation["requestBody"]["content"]["application/json"]["schema"] == {
+            "$ref": "#/components/schemas/ClassifyRequest"
+        }
+        assert "422" in operation["responses"]
+    
     def test_invalid_field_type(self, client):
         """测试无效的字段类型"""
         response = client.post(
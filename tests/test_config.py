@@ -44,6 +44,18 @@ class TestSettings:
         assert isinstance(origins, list)
         assert len(origins) > 0
     
+    def test_derived_values_follow_fields(self):
+        """测试派生属性随配置项变化，且不影响配置对象的比较"""
+        from config import settings
+        
+        before = settings.model_copy()
+        settings.log_file_path
+        settings.allow_origins_list
+        copied = settings.model_copy(update={"log_file": "logs/other.log"})
+        
+        assert copied.log_file_path == settings.project_root / "logs/other.log"
+        assert before == settings
+    
     def test_settings_validation(self):
         """测试配置验证"""
         from config import settings
@@ -51,6 +63,15 @@ class TestSettings:
         # 配置验证应该成功（因为在 conftest.py 中设置了测试环境变量）
         is_valid = settings.validate()
         assert is_valid is True
+    
+    def test_worker_count(self):
+        """测试 worker 进程数"""
+        from config import settings
+        
+        assert settings.model_copy(update={"debug": False, "workers": 3}).worker_count == 3
+        assert settings.model_copy(update={"debug": False, "workers": 0}).worker_count >= 1
+        # debug 模式下固定单进程（热重载）
+        assert settings.model_copy(update={"debug": True, "workers": 3}).worker_count == 1
 
 
 class TestConfigModule:
@@ -2,14 +2,31 @@
 测试 LLM 服务
 注意：这些测试需要 mock LLM API 调用，或者在有 API Key 的情况下运行集成测试
 """
+import asyncio
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 import json
 
-from app.services.llm_service import classify_input, translate_stream
+from app.services.llm_service import classify_input, translate_stream, _new_request_id, _dump_llm_output
 from app.models.schemas import ClassificationResult
 
 
+async def _async_iter(items):
+    """把列表包装成异步迭代器（模拟 AsyncAnthropic 的 text_stream）"""
+    for item in items:
+        yield item
+
+
+class TestRequestId:
+    """测试请求 ID 生成"""
+    
+    def test_request_ids_unique(self):
+        """测试连续生成的请求 ID 不重复"""
+        ids = [_new_request_id() for _ in range(1000)]
+        
+        assert len(set(ids)) == len(ids)
+
+
 class TestClassifyInput:
     """测试分类功能"""
     
@@ -28,7 +45,7 @@ class TestClassifyInput:
             "keywords": ["用户", "登录", "功能"],
             "action": "translate"
         }))]
-        mock_client.messages.create.return_value = mock_message
+        mock_client.messages.create = AsyncMock(return_value=mock_message)
         mock_get_client.return_value = mock_client
         
         # 执行测试
@@ -57,7 +74,7 @@ class TestClassifyInput:
             "keywords": ["数据库", "优化", "Redis", "QPS"],
             "action": "translate"
         }))]
-        mock_client.messages.create.return_value = mock_message
+        mock_client.messages.create = AsyncMock(return_value=mock_message)
         mock_get_client.return_value = mock_client
         
         # 执行测试
@@ -85,7 +102,7 @@ class TestClassifyInput:
             "keywords": ["功能"],
             "action": "clarify"
         }))]
-        mock_client.messages.create.return_value = mock_message
+        mock_client.messages.create = AsyncMock(return_value=mock_message)
         mock_get_client.return_value = mock_client
         
         # 执行测试
@@ -98,6 +115,71 @@ class TestClassifyInput:
         assert result.action == "clarify"
 
 
+    @pytest.mark.asyncio
+    @patch('app.services.llm_service.get_llm_client')
+    async def test_classify_fenced_json(self, mock_get_client, sample_pm_input):
+        """测试解析包含在 ```json 代码块中的分类结果"""
+        payload = json.dumps({
+            "type": "产品需求",
+            "confidence": 0.9,
+            "reasoning": "包含功能需求",
+            "keywords": ["登录"],
+            "action": "translate"
+        }, ensure_ascii=False)
+        mock_client = Mock()
+        mock_message = Mock()
+        mock_message.content = [Mock(text=f"分类结果如下：\n```json\n{payload}\n```")]
+        mock_client.messages.create = AsyncMock(return_value=mock_message)
+        mock_get_client.return_value = mock_client
+        
+        result = await classify_input(sample_pm_input)
+        
+        assert result.type == "产品需求"
+        assert result.keywords == ["登录"]
+    
+    @pytest.mark.asyncio
+    @patch('app.services.llm_service.get_llm_client')
+    async def test_classify_json_with_surrounding_text(self, mock_get_client, sample_pm_input):
+        """测试解析前后带有说明文字（无代码块）的分类结果"""
+        payload = json.dumps({
+            "type": "技术方案",
+            "confidence": 0.8,
+            "reasoning": "包含技术改动",
+            "keywords": ["索引"],
+            "action": "translate"
+        }, ensure_ascii=False)
+        mock_client = Mock()
+        mock_message = Mock()
+        mock_message.content = [Mock(text=f"分类结果：{payload}\n以上。")]
+        mock_client.messages.create = AsyncMock(return_value=mock_message)
+        mock_get_client.return_value = mock_client
+        
+        result = await classify_input(sample_pm_input)
+        
+        assert result.type == "技术方案"
+    
+    @pytest.mark.asyncio
+    @patch('app.services.llm_service.get_llm_client')
+    async def test_classify_concurrent_same_input(self, mock_get_client, sample_pm_input):
+        """测试相同输入的并发分类只调用一次 LLM"""
+        mock_client = Mock()
+        mock_message = Mock()
+        mock_message.content = [Mock(text=json.dumps({
+            "type": "产品需求",
+            "confidence": 0.9,
+            "reasoning": "包含功能需求",
+            "keywords": ["登录"],
+            "action": "translate"
+        }))]
+        mock_client.messages.create = AsyncMock(return_value=mock_message)
+        mock_get_client.return_value = mock_client
+        
+        results = await asyncio.gather(*(classify_input(sample_pm_input) for _ in range(3)))
+        
+        assert mock_client.messages.create.await_count == 1
+        assert all(result.type == "产品需求" for result in results)
+
+
 class TestTranslateStream:
     """测试翻译流式输出"""
     
@@ -110,7 +192,7 @@ class TestTranslateStream:
         mock_stream = Mock()
         
         # 模拟流式输出
-        mock_stream.text_stream = iter([
+        mock_stream.text_stream = _async_iter([
             "[理解确认]\n\n",
             "我理解您的需求...\n\n",
             "[需求技术化描述]\n\n",
@@ -120,10 +202,10 @@ class TestTranslateStream:
         mock_final_message = Mock()
         mock_final_message.usage.input_tokens = 1000
         mock_final_message.usage.output_tokens = 500
-        mock_stream.get_final_message.return_value = mock_final_message
+        mock_stream.get_final_message = AsyncMock(return_value=mock_final_message)
         
-        mock_stream.__enter__ = Mock(return_value=mock_stream)
-        mock_stream.__exit__ = Mock(return_value=False)
+        mock_stream.__aenter__ = AsyncMock(return_value=mock_stream)
+        mock_stream.__aexit__ = AsyncMock(return_value=False)
         
         mock_client.messages.stream.return_value = mock_stream
         mock_get_client.return_value = mock_client
@@ -145,13 +227,13 @@ class TestTranslateStream:
         # Mock LLM 流式响应
         mock_client = Mock()
         mock_stream = Mock()
-        mock_stream.text_stream = iter(["[理解确认]\n\n", "测试内容"])
+        mock_stream.text_stream = _async_iter(["[理解确认]\n\n", "测试内容"])
         mock_final_message = Mock()
         mock_final_message.usage.input_tokens = 1000
         mock_final_message.usage.output_tokens = 500
-        mock_stream.get_final_message.return_value = mock_final_message
-        mock_stream.__enter__ = Mock(return_value=mock_stream)
-        mock_stream.__exit__ = Mock(return_value=False)
+        mock_stream.get_final_message = AsyncMock(return_value=mock_final_message)
+        mock_stream.__aenter__ = AsyncMock(return_value=mock_stream)
+        mock_stream.__aexit__ = AsyncMock(return_value=False)
         mock_client.messages.stream.return_value = mock_stream
         mock_get_client.return_value = mock_client
         
@@ -171,6 +253,29 @@ class TestTranslateStream:
         assert len(chunks) > 0
 
 
+class TestDumpLLMOutput:
+    """测试 LLM 输出记录文件"""
+    
+    def test_dump_llm_output(self, tmp_path):
+        """测试写入完整输出文件"""
+        request_id = _new_request_id()
+        
+        output_file = _dump_llm_output(
+            request_id, "用户输入", "pm", "dev", "auto",
+            "产品需求", 0.95, "系统提示词", "第一行\n第二行", 2, 7,
+            logs_dir=tmp_path
+        )
+        
+        assert output_file.parent == tmp_path
+        assert [path.name for path in tmp_path.iterdir()] == [output_file.name]
+        content = output_file.read_text(encoding="utf-8")
+        assert f"Request ID: {request_id}" in content
+        assert "Classification Type: 产品需求 (置信度: 95%)" in content
+        assert "Translation: PM → DEV" in content
+        assert "第一行\n第二行" in content
+        assert "换行符数量: 1" in content
+
+
 @pytest.mark.integration
 class TestLLMServiceIntegration:
     """集成测试（需要真实的 API Key）
@@ -0,0 +1,61 @@
+"""
+测试日志配置
+"""
+import logging
+import queue
+
+from app.core.logging import BoundedQueueHandler, _DrainingQueueListener
+
+
+class _ListHandler(logging.Handler):
+    """把日志记录保存到列表中"""
+    
+    def __init__(self):
+        super().__init__()
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _make_record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("test", logging.INFO, __file__, 0, message, None, None)
+
+
+class TestBoundedQueue:
+    """测试有界日志队列"""
+    
+    def test_drop_when_full(self):
+        """测试队列满时丢弃日志并计数，不阻塞调用方"""
+        handler = BoundedQueueHandler(queue.Queue(maxsize=2))
+        
+        for i in range(5):
+            handler.handle(_make_record(f"message {i}"))
+        
+        assert handler.queue.qsize() == 2
+        assert handler.dropped == 3
+    
+    def test_listener_reports_drops(self):
+        """测试后台线程发现丢弃后输出告警，并限制告警频率"""
+        handler = BoundedQueueHandler(queue.Queue(maxsize=1))
+        output = _ListHandler()
+        listener = _DrainingQueueListener(handler, output)
+        
+        for i in range(3):
+            handler.handle(_make_record(f"message {i}"))
+        listener.handle(handler.queue.get_nowait())
+        
+        warnings = [r for r in output.records if r.levelno == logging.WARNING]
+        assert len(warnings) == 1
+        assert warnings[0].getMessage() == "日志队列已满，丢弃了 2 条日志（累计 2 条）"
+        
+        # 限频期间的新丢弃不立即告警，停止时补充输出
+        handler.handle(_make_record("message 3"))
+        handler.handle(_make_record("message 4"))
+        listener.handle(handler.queue.get_nowait())
+        assert len([r for r in output.records if r.levelno == logging.WARNING]) == 1
+        
+        listener.report_dropped(force=True)
+        warnings = [r for r in output.records if r.levelno == logging.WARNING]
+        assert len(warnings) == 2
+        assert warnings[1].getMessage() == "日志队列已满，丢弃了 1 条日志（累计 3 条）"
@@ -4,7 +4,7 @@
 import pytest
 from pathlib import Path
 
-from app.services.skill_service import read_skill
+from app.services.skill_service import read_skill, warm_prompts, _PROMPT_CACHE, _build_skill
 from config import settings
 
 
@@ -63,6 +63,32 @@ class TestSkillService:
         assert "对用户体验的影响" in prompt
         assert "对业务指标的影响" in prompt
     
+    def test_read_skill_cached(self, monkeypatch):
+        """测试组装结果被缓存（非 debug 模式）"""
+        monkeypatch.setattr(settings, "debug", False)
+        
+        first = read_skill("translator", "pm", "dev")
+        second = read_skill("translator", "pm", "dev")
+        
+        assert first is second
+    
+    def test_warm_prompts(self, monkeypatch):
+        """测试预加载 Prompt 文件，且预先组装的结果能被 read_skill 命中"""
+        monkeypatch.setattr(settings, "debug", False)
+        warm_prompts()
+        
+        assert "prompts/translator.md" in _PROMPT_CACHE
+        assert "modules/roles/pm.md" in _PROMPT_CACHE
+        
+        before = _build_skill.cache_info()
+        read_skill("classifier")
+        assert "{{SOURCE_ROLE}}" not in read_skill("translator", "pm", "dev")
+        after = _build_skill.cache_info()
+        
+        assert after.hits == before.hits + 2
+        assert after.misses == before.misses
+        assert after.currsize == before.currsize
+    
     def test_invalid_skill_name(self):
         """测试无效的 Skill 名称"""
         with pytest.raises(Exception):
@@ -0,0 +1,91 @@
+"""
+测试静态资源缓存
+"""
+import gzip
+
+import brotli
+
+from app.core.static_assets import build_manifest, load_asset, precompress_static
+
+
+class TestBuildManifest:
+    """测试静态资源清单"""
+    
+    def test_reuse_unchanged_assets(self, tmp_path):
+        """测试重新扫描时复用未变化的文件，只重新读取变化的文件"""
+        (tmp_path / "app.js").write_text("console.log('v1');" * 100)
+        (tmp_path / "style.css").write_text("body { color: red; }" * 100)
+        first = build_manifest(tmp_path)
+        
+        (tmp_path / "app.js").write_text("console.log('v2 changed');" * 100)
+        second = build_manifest(tmp_path, previous=first)
+        
+        assert second["style.css"] is first["style.css"]
+        assert second["app.js"] is not first["app.js"]
+        assert b"v2 changed" in second["app.js"].body
+    
+    def test_removed_assets_dropped(self, tmp_path):
+        """测试删除的文件从清单中移除"""
+        (tmp_path / "old.js").write_text("var a = 1;")
+        first = build_manifest(tmp_path)
+        
+        (tmp_path / "old.js").unlink()
+        
+        assert "old.js" not in build_manifest(tmp_path, previous=first)
+    
+    def test_no_compress(self, tmp_path):
+        """测试关闭压缩时不在内存中压缩"""
+        (tmp_path / "app.js").write_text("console.log('hello');" * 100)
+        
+        manifest = build_manifest(tmp_path, compress=False)
+        
+        assert manifest["app.js"].encoded_bodies == {}
+    
+    def test_standalone_compressed_file(self, tmp_path):
+        """测试没有源文件的 .gz 文件作为普通静态文件，有源文件的预压缩文件和临时文件被跳过"""
+        (tmp_path / "data.json.gz").write_bytes(gzip.compress(b'{"a": 1}' * 100))
+        (tmp_path / "app.js").write_text("console.log('hello');" * 100)
+        (tmp_path / "app.js.br").write_bytes(brotli.compress(b"console.log('hello');" * 100))
+        (tmp_path / "app.js.1234.tmp.gz").write_bytes(b"partial")
+        
+        manifest = build_manifest(tmp_path)
+        
+        assert sorted(manifest) == ["app.js", "data.json.gz"]
+        assert manifest["data.json.gz"].encoded_bodies == {}
+
+
+class TestPrecompressed:
+    """测试预压缩文件"""
+    
+    def test_precompress_static(self, tmp_path):
+        """测试生成与源文件一致的预压缩文件"""
+        source = tmp_path / "app.js"
+        source.write_text("console.log('hello');" * 100)
+        
+        precompress_static(tmp_path)
+        
+        assert brotli.decompress((tmp_path / "app.js.br").read_bytes()) == source.read_bytes()
+        assert gzip.decompress((tmp_path / "app.js.gz").read_bytes()) == source.read_bytes()
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["app.js", "app.js.br", "app.js.gz"]
+    
+    def test_stale_precompressed_ignored(self, tmp_path):
+        """测试修改时间更新但内容过期的预压缩文件不会被使用，并会被重新生成"""
+        source = tmp_path / "app.js"
+        source.write_text("console.log('new');" * 100)
+        (tmp_path / "app.js.br").write_bytes(brotli.compress(b"console.log('old');" * 100))
+        
+        asset = load_asset(source)
+        assert brotli.decompress(asset.encoded_bodies["br"]) == asset.body
+        
+        precompress_static(tmp_path)
+        assert brotli.decompress((tmp_path / "app.js.br").read_bytes()) == source.read_bytes()
+    
+    def test_truncated_precompressed_ignored(self, tmp_path):
+        """测试不完整（如写了一半）的预压缩文件不会被使用"""
+        source = tmp_path / "app.js"
+        source.write_text("console.log('hello');" * 100)
+        (tmp_path / "app.js.gz").write_bytes(gzip.compress(source.read_bytes())[:10])
+        
+        asset = load_asset(source)
+        
+        assert gzip.decompress(asset.encoded_bodies["gzip"]) == asset.body